@@ -3,13 +3,263 @@ import shutil
 import os
 import re
 import tempfile
+import threading
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
+from pathlib import Path
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+import contextlib
+import functools
+import heapq
 import logging
+import operator
+from models import HistoryEntry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tuning for the private copy used when the original file cannot be opened read-only
+_COPY_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-65536;
+PRAGMA temp_store=MEMORY;
+"""
+
+# Domain stats returned by the readers, more than the dashboard's top 10
+_TOP_DOMAINS = 200
+
+# Prepared statements kept per connection. The queries below are fixed
+# strings, so on the long-lived connection each is parsed and planned once.
+_CACHED_STATEMENTS = 256
+
+# Host part of a URL, without scheme, "www.", port, path, query or fragment.
+# The scheme is RFC 3986's, so chrome-extension:// has a host and blob:https://
+# or view-source:https:// do not; _HOSTS_CTE applies the same rule in SQL.
+_DOMAIN_RE = re.compile(r'^[a-z][a-z0-9+.-]*://(?:www\.)?([^/:?#]+)', re.IGNORECASE)
+
+# URL patterns per category, in priority order. Patterns naming a whole domain
+# (github.com, twitch.tv, ...) are matched against the visited host and its
+# parent domains; the rest (docs., google.com/search, ...) are URL substrings.
+# A domain match always beats a substring match, in _categorize_url and in the
+# CASE expression of the SQL queries alike.
+_CATEGORY_PATTERNS = [
+    ('social', ['facebook.com', 'twitter.com', 'instagram.com', 'reddit.com', 'tiktok.com']),
+    ('development', ['github.com', 'stackoverflow.com', 'gitlab.com', 'bitbucket.org']),
+    ('documentation', ['docs.', 'documentation', 'readme', 'api.']),
+    ('search', ['google.com/search', 'bing.com/search', 'duckduckgo.com']),
+    ('news', ['news.', 'bbc.com', 'cnn.com', 'reuters.com']),
+    ('shopping', ['amazon.com', 'ebay.com', 'shop.', 'store.']),
+    ('entertainment', ['youtube.com', 'netflix.com', 'spotify.com', 'twitch.tv']),
+    ('email', ['gmail.com', 'outlook.com', 'yahoo.com/mail']),
+]
+
+# Patterns naming a whole domain are resolved with a dict lookup on the
+# already extracted domain (earlier categories win on duplicates)
+_DOMAIN_PATTERN_RE = re.compile(r'[a-z0-9-]+(?:\.[a-z0-9-]+)+')
+_DOMAIN_CATEGORY = {
+    pattern: category
+    for category, patterns in reversed(_CATEGORY_PATTERNS)
+    for pattern in patterns
+    if _DOMAIN_PATTERN_RE.fullmatch(pattern)
+}
+
+# The remaining prefix/path/keyword patterns in one alternation, so each URL
+# is scanned once
+_URL_PATTERNS = [
+    (category, [p for p in patterns if p not in _DOMAIN_CATEGORY])
+    for category, patterns in _CATEGORY_PATTERNS
+]
+_CATEGORY_RE = re.compile("|".join(
+    f"(?P<{category}>" + "|".join(map(re.escape, url_patterns)) + ")"
+    for category, url_patterns in _URL_PATTERNS
+    if url_patterns
+))
+_CATEGORY_RANK = {category: rank for rank, (category, _) in enumerate(_CATEGORY_PATTERNS)}
+
+# Search engine domain -> path its result pages live under
+_SEARCH_ENGINES = {
+    'google.com': '/search',
+    'bing.com': '/search',
+    'duckduckgo.com': '/',
+}
+
+# Expects the host column of _HOSTS_CTE. Domain patterns match the host or any
+# subdomain of it (which also covers "www."), before any URL substring is
+# tried, so a search for "reddit.com" is still a search. LIKE is
+# case-insensitive for ASCII, matching the lowercased check in Python.
+# Unmatched URLs yield NULL and are categorized in Python.
+_CATEGORY_CASE = "CASE " + " ".join(
+    [
+        "WHEN " + " OR ".join(
+            f"host = '{pattern}' OR host LIKE '%.{pattern}'"
+            for pattern in patterns if pattern in _DOMAIN_CATEGORY
+        ) + f" THEN '{category}'"
+        for category, patterns in _CATEGORY_PATTERNS
+        if any(pattern in _DOMAIN_CATEGORY for pattern in patterns)
+    ] + [
+        "WHEN " + " OR ".join(f"url LIKE '%{pattern}%'" for pattern in url_patterns) + f" THEN '{category}'"
+        for category, url_patterns in _URL_PATTERNS
+        if url_patterns
+    ]
+) + " END"
+
+# Recent visits with the host cut out of the URL by _DOMAIN_RE's scheme rule:
+# only when what precedes the first "://" is a scheme (a letter, then letters,
+# digits, '+', '.' or '-'), drop it and stop at the first '/', ':', '?' or '#'.
+# Other URLs get a NULL host. "www." is left on; the queries strip it where
+# _DOMAIN_RE would. SQLite flattens both CTEs into the query that uses them.
+_HOSTS_CTE = """
+WITH recent AS (
+    SELECT
+        url,
+        title,
+        last_visit_time,
+        visit_count,
+        typed_count,
+        -- With no "://" the prefix is '', which fails the first GLOB
+        CASE
+            WHEN SUBSTR(url, 1, INSTR(url, '://') - 1) GLOB '[a-zA-Z]*'
+                AND SUBSTR(url, 1, INSTR(url, '://') - 1) NOT GLOB '*[^a-zA-Z0-9+.-]*'
+            THEN LOWER(SUBSTR(url, INSTR(url, '://') + 3))
+        END AS rest
+    FROM urls
+    WHERE last_visit_time > ? AND hidden = 0
+),
+hosts AS (
+    SELECT
+        url,
+        title,
+        last_visit_time,
+        visit_count,
+        typed_count,
+        SUBSTR(rest, 1, MIN(
+            CASE WHEN INSTR(rest, '/') > 0 THEN INSTR(rest, '/') ELSE LENGTH(rest) + 1 END,
+            CASE WHEN INSTR(rest, ':') > 0 THEN INSTR(rest, ':') ELSE LENGTH(rest) + 1 END,
+            CASE WHEN INSTR(rest, '?') > 0 THEN INSTR(rest, '?') ELSE LENGTH(rest) + 1 END,
+            CASE WHEN INSTR(rest, '#') > 0 THEN INSTR(rest, '#') ELSE LENGTH(rest) + 1 END
+        ) - 1) AS host
+    FROM recent
+)
+"""
+
+# Chrome stores visit times as microseconds since 1601-01-01. Shifting to the
+# Unix epoch before dividing keeps ts exact to the microsecond.
+_HISTORY_QUERY = _HOSTS_CTE + f"""
+SELECT 
+    url, 
+    title, 
+    (last_visit_time - 11644473600000000) / 1000000.0 AS ts,
+    visit_count,
+    typed_count,
+    {_CATEGORY_CASE} AS category
+FROM hosts
+ORDER BY last_visit_time DESC
+LIMIT 20000
+"""
+
+# The bare category column comes from the row holding MAX(last_visit_time),
+# i.e. the most recent visit, as in get_domain_stats
+_DOMAIN_STATS_QUERY = _HOSTS_CTE + f"""
+SELECT
+    COALESCE(NULLIF(CASE WHEN host LIKE 'www._%' THEN SUBSTR(host, 5) ELSE host END, ''), 'unknown') AS domain,
+    SUM(visit_count) AS visits,
+    COALESCE({_CATEGORY_CASE}, 'other') AS category,
+    (MAX(last_visit_time) - 11644473600000000) / 1000000.0 AS ts
+FROM hosts
+GROUP BY domain
+ORDER BY visits DESC
+LIMIT {_TOP_DOMAINS}
+"""
+
+_CATEGORY_STATS_QUERY = _HOSTS_CTE + f"""
+SELECT COALESCE({_CATEGORY_CASE}, 'other') AS category, COUNT(*)
+FROM hosts
+GROUP BY category
+"""
+
+# Candidate search result URLs; _extract_search_query does the exact check
+_SEARCH_QUERY = """
+SELECT url
+FROM urls
+WHERE last_visit_time > ? AND hidden = 0
+    AND (url LIKE '%/search?%' OR url LIKE '%duckduckgo.com/?%q=%')
+ORDER BY last_visit_time DESC
+LIMIT 5000
+"""
+
+_SAMPLE_QUERY = """
+SELECT url
+FROM urls
+WHERE last_visit_time > ? AND hidden = 0
+ORDER BY last_visit_time DESC
+LIMIT ?
+"""
+
+_HOURLY_ACTIVITY_QUERY = """
+SELECT
+    CAST(strftime('%H', last_visit_time / 1000000 - 11644473600, 'unixepoch', 'localtime') AS INTEGER) AS hour,
+    COUNT(*)
+FROM urls
+WHERE last_visit_time > ? AND hidden = 0
+GROUP BY hour
+"""
+
+@functools.lru_cache(maxsize=65536)
+def extract_search_query(url):
+    """Search terms from a search engine results URL, or None
+    
+    Shared by the local and InfluxDB paths so both report the same queries;
+    memoised because history repeats the same URLs.
+    """
+    try:
+        parsed = urlsplit(url)
+        domain = parsed.hostname or ''
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        
+        results_path = _SEARCH_ENGINES.get(domain)
+        if results_path is None or not parsed.path.startswith(results_path):
+            return None
+        
+        # parse_qs also decodes '+' and percent escapes
+        query = parse_qs(parsed.query).get('q', [''])[0].strip()
+        return query if len(query) > 2 else None  # Filter out very short queries
+        
+    except ValueError as e:
+        logger.debug(f"Could not extract query from {url}: {e}")
+        return None
+
+def _fast_copy(src, dst):
+    """Copy src to dst inside the kernel where the platform allows it
+    
+    os.copy_file_range (Linux) never moves the bytes through user space and
+    reflinks on btrfs/xfs. A hardlink is deliberately not attempted: the copy
+    gets tuned with PRAGMAs, which would then modify Chrome's own file.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining <= 0:
+                return
+            # A short copy: the filesystem returned 0 or the file shrank mid-copy
+            logger.debug(f"copy_file_range stopped {remaining} bytes short, falling back to shutil")
+        except PermissionError:
+            raise
+        except OSError as e:
+            # e.g. EXDEV on older kernels or filesystems without support
+            logger.debug(f"copy_file_range failed ({e}), falling back to shutil")
+    
+    shutil.copy2(src, dst)
+
 class ChromeHistoryReader:
     def __init__(self):
         # First check for custom paths from environment variables
@@ -42,286 +292,368 @@ class ChromeHistoryReader:
             os.path.expanduser("~/.config/chromium/Profile 2/History"),
         ]
         
+        # History file found by the last _find_history_file scan
+        self._resolved_path = None
+        
+        # Long-lived connection to the history database, shared between the
+        # collection thread and request handlers under self._lock
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_key = None  # (path, mtime) the connection was opened for
+        self._temp_path = None
+        
         logger.info(f"ChromeHistoryReader initialized with {len(self.history_paths)} potential paths")
         if extra_paths:
             logger.info(f"Custom paths from environment: {extra_paths}")
         
     def get_chrome_history(self, days_back=7):
         """Read Chrome history for the last N days"""
-        temp_path = None
-        
         try:
-            # Find an accessible Chrome history file
-            history_path = self._find_history_file()
-            if not history_path:
-                logger.warning("No accessible Chrome history file found")
-                return []
-            
-            logger.info(f"Found Chrome history at: {history_path}")
-            
-            # Create a temporary file in a writable directory
-            temp_fd, temp_path = tempfile.mkstemp(suffix='.db')
-            os.close(temp_fd)
-            
-            # Try to copy the history file
-            try:
-                # First try a simple copy
-                shutil.copy2(history_path, temp_path)
-                logger.info("Successfully copied Chrome history file")
-            except PermissionError:
-                logger.warning("Permission denied, trying alternative copy method...")
-                # If that fails, try using cp command
-                import subprocess
-                try:
-                    subprocess.run(['cp', history_path, temp_path], check=True)
-                    logger.info("Successfully copied Chrome history file using cp")
-                except (subprocess.CalledProcessError, FileNotFoundError):
-                    logger.error("Failed to copy Chrome history file")
+            with self._connection() as conn:
+                if not conn:
                     return []
-            except Exception as e:
-                logger.error(f"Error copying Chrome history file: {e}")
-                return []
-            
-            # Verify the copy was successful
-            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-                logger.error("Failed to create valid copy of Chrome history file")
-                return []
-            
-            # Connect to the copied database
-            try:
-                conn = sqlite3.connect(temp_path)
-                cursor = conn.cursor()
-                logger.info("Successfully connected to Chrome history database")
-            except Exception as e:
-                logger.error(f"Failed to connect to Chrome history database: {e}")
-                return []
-            
-            # Calculate timestamp for N days ago
-            days_ago = datetime.now() - timedelta(days=days_back)
-            days_ago_timestamp = int((days_ago.timestamp() + 11644473600) * 1000000)
-            
-            logger.info(f"Querying for visits after: {days_ago} (timestamp: {days_ago_timestamp})")
-            
-            # Query for recent history
-            query = """
-            SELECT 
-                url, 
-                title, 
-                last_visit_time,
-                visit_count,
-                typed_count
-            FROM urls 
-            WHERE last_visit_time > ? 
-            ORDER BY last_visit_time DESC
-            """
-            
-            try:
-                cursor.execute(query, (days_ago_timestamp,))
-                rows = cursor.fetchall()
-                logger.info(f"Found {len(rows)} raw history entries")
-            except Exception as e:
-                logger.error(f"Failed to execute query: {e}")
-                conn.close()
-                return []
-            
-            history_data = []
-            processed_count = 0
-            error_count = 0
-            
-            for row in rows:
+                days_ago_timestamp = self._chrome_timestamp(days_back)
+                logger.info(f"Querying for visits in the last {days_back} days (timestamp: {days_ago_timestamp})")
+                
                 try:
-                    url, title, visit_time, visit_count, typed_count = row
-                    
-                    # Convert Chrome timestamp to datetime
-                    if visit_time:
-                        timestamp = (visit_time / 1000000) - 11644473600
-                        visit_datetime = datetime.fromtimestamp(timestamp)
-                    else:
-                        visit_datetime = None
-                    
-                    # Extract domain from URL
+                    cursor = conn.execute(_HISTORY_QUERY, (days_ago_timestamp,))
+                except Exception as e:
+                    logger.error(f"Failed to execute query: {e}")
+                    self._close_connection()
+                    return []
+                
+                history_data = []
+                error_count = 0
+                
+                # Per-row work is what remains after SQL; bind the hot lookups locally
+                append = history_data.append
+                fromtimestamp = datetime.fromtimestamp
+                match_domain = _DOMAIN_RE.match
+                categorize = self._categorize_url
+                
+                # Stream rows from the cursor rather than materializing them with fetchall()
+                for url, title, timestamp, visit_count, typed_count, category in cursor:
                     try:
-                        domain = urlparse(url).netloc
-                        if domain.startswith('www.'):
-                            domain = domain[4:]
-                    except:
-                        domain = "unknown"
-                    
-                    # Categorize the visit
-                    category = self._categorize_url(url, title)
-                    
-                    history_data.append({
-                        'url': url,
-                        'title': title,
+                        m = match_domain(url)
+                        domain = m.group(1).lower() if m else "unknown"
+                        append(HistoryEntry(
+                            url=url,
+                            title=title,
+                            domain=domain,
+                            visit_time=fromtimestamp(timestamp) if timestamp is not None else None,
+                            visit_count=visit_count or 0,
+                            typed_count=typed_count or 0,
+                            # Categorize the visit if SQL found no pattern
+                            category=category or categorize(domain, url, title)
+                        ))
+                    except Exception as e:
+                        error_count += 1
+                        logger.warning(f"Error processing history entry {len(history_data) + error_count}: {e}")
+                
+                logger.info(f"Successfully processed {len(history_data)} history entries (errors: {error_count})")
+                return history_data
+            
+        except Exception as e:
+            logger.error(f"Error reading Chrome history: {e}")
+            return []
+    
+    def get_history_aggregates(self, days_back=7):
+        """Compute domain, category and hourly stats inside SQLite
+        
+        Returns (domain_stats, category_stats, hourly_activity) as the
+        get_domain_stats list plus category and hour (as a string) counts, or
+        None if history cannot be read.
+        """
+        try:
+            with self._connection() as conn:
+                if not conn:
+                    return None
+                
+                params = (self._chrome_timestamp(days_back),)
+                fromtimestamp = datetime.fromtimestamp
+                
+                domain_stats = [
+                    {
                         'domain': domain,
-                        'visit_time': visit_datetime,
                         'visit_count': visit_count or 0,
-                        'typed_count': typed_count or 0,
-                        'category': category
-                    })
-                    processed_count += 1
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.warning(f"Error processing history entry {processed_count + error_count}: {e}")
-                    continue
-            
-            conn.close()
+                        'category': category,
+                        'last_visit': fromtimestamp(timestamp) if timestamp is not None else None
+                    }
+                    for domain, visit_count, category, timestamp in conn.execute(_DOMAIN_STATS_QUERY, params)
+                ]
+                category_stats = dict(conn.execute(_CATEGORY_STATS_QUERY, params))
+                hourly_activity = {
+                    str(hour): count
+                    for hour, count in conn.execute(_HOURLY_ACTIVITY_QUERY, params)
+                }
+                
+                logger.info(f"Aggregated Chrome history into {len(domain_stats)} domains")
+                return domain_stats, category_stats, hourly_activity
             
-            logger.info(f"Successfully processed {processed_count} history entries (errors: {error_count})")
-            return history_data
+        except Exception as e:
+            logger.error(f"Error aggregating Chrome history: {e}")
+            return None
+    
+    def quick_info(self, limit=5, days_back=1):
+        """Return the most recent URLs with their domains, skipping the full pipeline"""
+        try:
+            with self._connection() as conn:
+                if not conn:
+                    return []
+                
+                sample = []
+                for (url,) in conn.execute(_SAMPLE_QUERY, (self._chrome_timestamp(days_back), limit)):
+                    m = _DOMAIN_RE.match(url)
+                    sample.append({'url': url, 'domain': m.group(1).lower() if m else "unknown"})
+                return sample
             
         except Exception as e:
-            logger.error(f"Error reading Chrome history: {e}")
+            logger.error(f"Error sampling Chrome history: {e}")
             return []
-        finally:
-            # Clean up temp file
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                    logger.debug("Cleaned up temporary Chrome history file")
-                except Exception as e:
-                    logger.warning(f"Could not remove temporary file {temp_path}: {e}")
+    
+    @staticmethod
+    def _chrome_timestamp(days_back):
+        """Chrome timestamp (microseconds since 1601-01-01) for N days ago"""
+        days_ago = datetime.now() - timedelta(days=days_back)
+        return int((days_ago.timestamp() + 11644473600) * 1000000)
+    
+    def close(self):
+        """Close the shared history database connection"""
+        with self._lock:
+            self._close_connection()
+    
+    @contextlib.contextmanager
+    def _connection(self):
+        """Hold the lock and yield the shared connection, or None if there is
+        no readable history file; the connection is shared with the collector
+        thread and request handlers"""
+        history_path = self._find_history_file()
+        if not history_path:
+            logger.warning("No accessible Chrome history file found")
+            yield None
+            return
+        
+        logger.debug(f"Found Chrome history at: {history_path}")
+        with self._lock:
+            yield self._get_connection(history_path)
+    
+    def _get_connection(self, history_path):
+        """Return the shared connection, reopening it when the file changes
+        
+        Must be called with self._lock held. The read-only connection is
+        opened with immutable=1, so SQLite never notices Chrome's writes, and
+        the fallback copy is a snapshot; both are reopened on a new mtime.
+        """
+        key = (history_path, os.path.getmtime(history_path))
+        if self._conn is not None and self._conn_key == key:
+            return self._conn
+        
+        self._close_connection()
+        self._conn, self._temp_path = self._open_history_db(history_path)
+        if self._conn:
+            self._conn_key = key
+        return self._conn
+    
+    def _close_connection(self):
+        """Close the shared connection; must be called with self._lock held"""
+        self._close_history_db(self._conn, self._temp_path)
+        self._conn = None
+        self._conn_key = None
+        self._temp_path = None
+    
+    def _open_history_db(self, history_path):
+        """Open the Chrome history database, returning (conn, temp_path)
+        
+        The original file is opened through a read-only immutable URI so no copy
+        is needed. If SQLite cannot open it that way (e.g. Chrome holds a lock on
+        Windows), fall back to a temporary copy; temp_path is None otherwise.
+        """
+        conn = None
+        try:
+            uri = Path(history_path).absolute().as_uri() + "?mode=ro&immutable=1&nolock=1"
+            conn = sqlite3.connect(
+                uri, uri=True, check_same_thread=False, cached_statements=_CACHED_STATEMENTS
+            )
+            # sqlite3 opens lazily, so touch the table to surface open errors here
+            conn.execute("SELECT 1 FROM urls LIMIT 1")
+            logger.info("Opened Chrome history database read-only")
+            return conn, None
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Read-only open failed ({e}), falling back to a temporary copy")
+            if conn:
+                conn.close()
+        
+        temp_path = self._copy_history_file(history_path)
+        if not temp_path:
+            return None, None
+        
+        try:
+            conn = sqlite3.connect(
+                temp_path, check_same_thread=False, cached_statements=_CACHED_STATEMENTS
+            )
+            # The copy is private to us, so it can be tuned freely. Chrome does
+            # not index urls.last_visit_time; the copy lives as long as the
+            # shared connection, so the index serves every query until then.
+            conn.executescript(_COPY_PRAGMAS)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lvt ON urls(last_visit_time)")
+            logger.info("Successfully connected to copied Chrome history database")
+            return conn, temp_path
+        except Exception as e:
+            logger.error(f"Failed to connect to Chrome history database: {e}")
+            self._close_history_db(None, temp_path)
+            return None, None
+    
+    def _copy_history_file(self, history_path):
+        """Copy the history file to a temporary location, returning its path"""
+        temp_fd, temp_path = tempfile.mkstemp(suffix='.db')
+        os.close(temp_fd)
+        
+        try:
+            # First try a kernel-side copy
+            _fast_copy(history_path, temp_path)
+            logger.info("Successfully copied Chrome history file")
+        except PermissionError:
+            logger.warning("Permission denied, trying alternative copy method...")
+            # If that fails, try using cp command
+            import subprocess
+            try:
+                subprocess.run(['cp', history_path, temp_path], check=True)
+                logger.info("Successfully copied Chrome history file using cp")
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                logger.error("Failed to copy Chrome history file")
+                self._close_history_db(None, temp_path)
+                return None
+        except Exception as e:
+            logger.error(f"Error copying Chrome history file: {e}")
+            self._close_history_db(None, temp_path)
+            return None
+        
+        # Verify the copy was successful
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            logger.error("Failed to create valid copy of Chrome history file")
+            self._close_history_db(None, temp_path)
+            return None
+        
+        return temp_path
+    
+    def _close_history_db(self, conn, temp_path):
+        """Close the connection and remove the temporary copy, if any"""
+        if conn:
+            conn.close()
+        if temp_path and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+                logger.debug("Cleaned up temporary Chrome history file")
+            except Exception as e:
+                logger.warning(f"Could not remove temporary file {temp_path}: {e}")
     
     def _find_history_file(self):
         """Find an accessible Chrome history file"""
+        # Reuse the previous hit until it disappears
+        if self._resolved_path and os.path.exists(self._resolved_path):
+            return self._resolved_path
+        
         logger.info("Searching for Chrome history files...")
+        self._resolved_path = None
         
         for path in self.history_paths:
             logger.debug(f"Checking path: {path}")
-            if os.path.exists(path):
-                try:
-                    # Check if we can read the file
-                    if os.access(path, os.R_OK):
-                        # Check if file is not empty
-                        file_size = os.path.getsize(path)
-                        if file_size > 0:
-                            logger.info(f"Found accessible Chrome history file: {path} (size: {file_size} bytes)")
-                            return path
-                        else:
-                            logger.debug(f"Chrome history file is empty: {path}")
-                    else:
-                        logger.debug(f"Cannot read Chrome history file: {path}")
-                except Exception as e:
-                    logger.debug(f"Error checking file {path}: {e}")
-            else:
+            try:
+                # One stat covers both the existence and the size check
+                file_size = os.stat(path).st_size
+            except FileNotFoundError:
                 logger.debug(f"Path does not exist: {path}")
+                continue
+            except OSError as e:
+                logger.debug(f"Error checking file {path}: {e}")
+                continue
+            
+            if not os.access(path, os.R_OK):
+                logger.debug(f"Cannot read Chrome history file: {path}")
+            elif file_size == 0:
+                logger.debug(f"Chrome history file is empty: {path}")
+            else:
+                logger.info(f"Found accessible Chrome history file: {path} (size: {file_size} bytes)")
+                self._resolved_path = path
+                return path
         
         logger.warning("No accessible Chrome history files found")
         return None
     
-    def _categorize_url(self, url, title):
-        """Categorize URLs based on domain and content"""
-        url_lower = url.lower()
-        title_lower = title.lower() if title else ""
-        
-        # Social media
-        if any(social in url_lower for social in ['facebook.com', 'twitter.com', 'instagram.com', 'reddit.com', 'tiktok.com']):
-            return 'social'
-        
-        # Development/Programming
-        if any(dev in url_lower for dev in ['github.com', 'stackoverflow.com', 'gitlab.com', 'bitbucket.org']):
-            return 'development'
-        
-        # Documentation
-        if any(doc in url_lower for doc in ['docs.', 'documentation', 'readme', 'api.']):
-            return 'documentation'
-        
-        # Search engines
-        if any(search in url_lower for search in ['google.com/search', 'bing.com/search', 'duckduckgo.com']):
-            return 'search'
-        
-        # News/Information
-        if any(news in url_lower for news in ['news.', 'bbc.com', 'cnn.com', 'reuters.com']):
-            return 'news'
+    def _categorize_url(self, domain, url, title):
+        """Categorize URLs based on domain and content
         
-        # Shopping
-        if any(shop in url_lower for shop in ['amazon.com', 'ebay.com', 'shop.', 'store.']):
-            return 'shopping'
+        The domain (or one of its parent domains) decides first; URL
+        patterns such as "docs." or "google.com/search" are checked otherwise.
+        """
+        while True:
+            category = _DOMAIN_CATEGORY.get(domain)
+            if category:
+                return category
+            dot = domain.find('.')
+            if dot < 0:
+                break
+            domain = domain[dot + 1:]
         
-        # Entertainment
-        if any(ent in url_lower for ent in ['youtube.com', 'netflix.com', 'spotify.com', 'twitch.tv']):
-            return 'entertainment'
-        
-        # Email
-        if any(mail in url_lower for mail in ['gmail.com', 'outlook.com', 'yahoo.com/mail']):
-            return 'email'
-        
-        return 'other'
+        # The leftmost match is not necessarily the highest-priority category,
+        # so keep the best-ranked one seen during the scan
+        matches = _CATEGORY_RE.finditer(url.lower())
+        return min((m.lastgroup for m in matches), key=_CATEGORY_RANK.__getitem__, default='other')
     
     def get_domain_stats(self, history_data):
         """Calculate domain statistics from history data"""
         domain_stats = {}
         
         for entry in history_data:
-            domain = entry['domain']
-            if domain not in domain_stats:
-                domain_stats[domain] = {
+            domain = entry.domain
+            stats = domain_stats.get(domain)
+            if stats is None:
+                stats = domain_stats[domain] = {
+                    'domain': domain,
                     'visit_count': 0,
-                    'total_time': 0,
-                    'category': entry['category'],
+                    'category': entry.category,
                     'last_visit': None
                 }
             
-            domain_stats[domain]['visit_count'] += entry['visit_count']
-            if entry['visit_time']:
-                if not domain_stats[domain]['last_visit'] or entry['visit_time'] > domain_stats[domain]['last_visit']:
-                    domain_stats[domain]['last_visit'] = entry['visit_time']
+            stats['visit_count'] += entry.visit_count
+            visit_time = entry.visit_time
+            if visit_time and (not stats['last_visit'] or visit_time > stats['last_visit']):
+                stats['last_visit'] = visit_time
         
-        # Convert to list and sort by visit count
-        domain_list = [
-            {
-                'domain': domain,
-                'visit_count': stats['visit_count'],
-                'category': stats['category'],
-                'last_visit': stats['last_visit']
-            }
-            for domain, stats in domain_stats.items()
-        ]
-        
-        domain_list.sort(key=lambda x: x['visit_count'], reverse=True)
-        return domain_list
+        # Only the busiest domains are consumed, so skip sorting the rest
+        return heapq.nlargest(_TOP_DOMAINS, domain_stats.values(), key=operator.itemgetter('visit_count'))
     
     def get_search_queries(self, history_data):
         """Extract search queries from history data"""
-        search_queries = {}
-        
-        for entry in history_data:
-            url = entry['url']
-            if 'google.com/search' in url or 'bing.com/search' in url:
-                # Extract search query from URL
-                try:
-                    if 'google.com/search' in url:
-                        query_start = url.find('q=') + 2
-                        query_end = url.find('&', query_start)
-                        if query_end == -1:
-                            query_end = len(url)
-                        query = url[query_start:query_end]
-                    else:
-                        query_start = url.find('q=') + 2
-                        query_end = url.find('&', query_start)
-                        if query_end == -1:
-                            query_end = len(url)
-                        query = url[query_start:query_end]
-                    
-                    # Decode URL encoding
-                    query = query.replace('+', ' ').replace('%20', ' ')
-                    
-                    if query and len(query) > 2:  # Filter out very short queries
-                        search_queries[query] = search_queries.get(query, 0) + 1
-                        
-                except Exception as e:
-                    logger.debug(f"Could not extract query from {url}: {e}")
-                    continue
+        search_urls = (entry.url for entry in history_data if entry.domain in _SEARCH_ENGINES)
+        return self._count_search_queries(search_urls)
+    
+    def get_search_queries_sql(self, days_back=7):
+        """Extract search queries for the last N days, pre-filtered in SQL"""
+        try:
+            with self._connection() as conn:
+                if not conn:
+                    return []
+                
+                rows = conn.execute(_SEARCH_QUERY, (self._chrome_timestamp(days_back),))
+                return self._count_search_queries(url for (url,) in rows)
+            
+        except Exception as e:
+            logger.error(f"Error reading Chrome search queries: {e}")
+            return []
+    
+    def _count_search_queries(self, urls):
+        """Count search queries in the given URLs, returning the top 20"""
+        search_queries = Counter(query for query in map(self._extract_search_query, urls) if query)
         
-        # Convert to list and sort by count
-        search_list = [
+        return [
             {'query': query, 'count': count}
-            for query, count in search_queries.items()
+            for query, count in search_queries.most_common(20)  # Return top 20 searches
         ]
-        
-        search_list.sort(key=lambda x: x['count'], reverse=True)
-        return search_list[:20]  # Return top 20 searches
+    
+    def _extract_search_query(self, url):
+        """Extract the search query from a search engine results URL"""
+        return extract_search_query(url)
 
     def test_history_access(self):
         """Test if we can access and read Chrome history files"""
@@ -333,46 +665,21 @@ class ChromeHistoryReader:
             logger.error("No accessible Chrome history files found")
             return False
         
-        # Test file copy
+        conn = None
         temp_path = None
         try:
-            temp_fd, temp_path = tempfile.mkstemp(suffix='.db')
-            os.close(temp_fd)
+            conn, temp_path = self._open_history_db(history_path)
+            if not conn:
+                logger.error("Could not open Chrome history database")
+                return False
             
-            # Try to copy
-            shutil.copy2(history_path, temp_path)
+            # Test basic query
+            count = conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            logger.info(f"Database connection successful, found {count} total URLs")
+            return True
             
-            if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
-                logger.info("Successfully copied Chrome history file")
-                
-                # Test database connection
-                try:
-                    conn = sqlite3.connect(temp_path)
-                    cursor = conn.cursor()
-                    
-                    # Test basic query
-                    cursor.execute("SELECT COUNT(*) FROM urls")
-                    count = cursor.fetchone()[0]
-                    logger.info(f"Database connection successful, found {count} total URLs")
-                    
-                    conn.close()
-                    return True
-                    
-                except Exception as e:
-                    logger.error(f"Database connection failed: {e}")
-                    return False
-            else:
-                logger.error("File copy failed or resulted in empty file")
-                return False
-                
         except Exception as e:
-            logger.error(f"File copy test failed: {e}")
+            logger.error(f"Database connection failed: {e}")
             return False
         finally:
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
-        
-        return False
+            self._close_history_db(conn, temp_path)
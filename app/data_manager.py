@@ -1,4 +1,5 @@
 import logging
+import sched
 import threading
 import time
 from datetime import datetime, timedelta
@@ -13,8 +14,16 @@ class DataManager:
         self.influx_service = InfluxDBService()
         self.last_collection_time = None
         self.collection_interval = 300  # 5 minutes
+        self.write_batch_size = 5000  # history entries per InfluxDB write
         self.is_running = False
         self.collection_thread = None
+        # Periodic jobs run on one scheduler thread; waiting on the stop event
+        # instead of time.sleep lets stop_data_collection wake it immediately
+        self._stop_event = threading.Event()
+        self._scheduler = sched.scheduler(time.monotonic, self._stop_event.wait)
+        # Guards is_running together with the queue, so a tick cannot re-enter
+        # itself after stop_data_collection has cancelled the queue
+        self._schedule_lock = threading.Lock()
         
     def start_data_collection(self):
         """Start the data collection service"""
@@ -29,32 +38,45 @@ class DataManager:
         # Initial data collection
         self.collect_chrome_data()
         
-        # Start background collection thread
-        self.is_running = True
-        self.collection_thread = threading.Thread(target=self._collection_loop, daemon=True)
+        # Schedule periodic collection on the background scheduler thread
+        with self._schedule_lock:
+            self.is_running = True
+            self._stop_event.clear()
+            self._scheduler.enter(self.collection_interval, 0, self._collection_tick)
+        self.collection_thread = threading.Thread(target=self._scheduler.run, name='collector', daemon=True)
         self.collection_thread.start()
         
         logger.info("Data collection service started")
     
     def stop_data_collection(self):
         """Stop the data collection service"""
-        self.is_running = False
+        with self._schedule_lock:
+            self.is_running = False
+            for event in self._scheduler.queue:
+                try:
+                    self._scheduler.cancel(event)
+                except ValueError:
+                    pass  # Already started running
+        self._stop_event.set()
         if self.collection_thread:
             self.collection_thread.join(timeout=5)
         
+        self.chrome_reader.close()
         self.influx_service.close()
         logger.info("Data collection service stopped")
     
-    def _collection_loop(self):
-        """Background loop for periodic data collection"""
-        while self.is_running:
-            try:
-                time.sleep(self.collection_interval)
-                if self.is_running:
-                    self.collect_chrome_data()
-            except Exception as e:
-                logger.error(f"Error in collection loop: {e}")
-                time.sleep(60)  # Wait a minute before retrying
+    def _collection_tick(self):
+        """Scheduled job: collect data, then queue the next run"""
+        delay = self.collection_interval
+        try:
+            self.collect_chrome_data()
+        except Exception as e:
+            logger.error(f"Error in collection loop: {e}")
+            delay = 60  # Retry after a minute
+        
+        with self._schedule_lock:
+            if self.is_running:
+                self._scheduler.enter(delay, 0, self._collection_tick)
     
     def collect_chrome_data(self):
         """Collect Chrome history data and store it"""
@@ -68,12 +90,20 @@ class DataManager:
                 logger.warning("No Chrome history data found")
                 return
             
-            # Store data in InfluxDB if connected
+            # Store data in InfluxDB if connected, one write request per batch
             if self.influx_service.client:
-                if self.influx_service.store_chrome_history(history_data):
-                    logger.info(f"Successfully stored {len(history_data)} history entries")
-                else:
-                    logger.error("Failed to store data in InfluxDB")
+                stored = 0
+                for start in range(0, len(history_data), self.write_batch_size):
+                    batch = history_data[start:start + self.write_batch_size]
+                    # Entries with nothing to chart are skipped, so count what was queued
+                    queued = self.influx_service.store_chrome_history(batch)
+                    if queued is None:
+                        logger.error("Failed to store data in InfluxDB")
+                    else:
+                        stored += queued
+                
+                if stored:
+                    logger.info(f"Successfully queued {stored} history entries")
             
             # Update last collection time
             self.last_collection_time = datetime.now()
@@ -90,10 +120,8 @@ class DataManager:
         try:
             # Try to get data from InfluxDB first
             if self.influx_service.client:
-                domain_stats = self.influx_service.get_domain_stats(days_back)
-                search_queries = self.influx_service.get_search_queries(days_back)
-                category_stats = self.influx_service.get_category_stats(days_back)
-                hourly_activity = self.influx_service.get_hourly_activity(days_back)
+                (domain_stats, search_queries,
+                 category_stats, hourly_activity) = self.influx_service.get_dashboard_bundle(days_back)
                 
                 if domain_stats and search_queries:
                     return self._format_dashboard_data(
@@ -111,28 +139,15 @@ class DataManager:
     def _get_local_dashboard_data(self, days_back=7):
         """Get dashboard data from local Chrome history"""
         try:
-            # Read Chrome history
-            history_data = self.chrome_reader.get_chrome_history(days_back)
+            # Let SQLite aggregate domains, categories and hours
+            aggregates = self.chrome_reader.get_history_aggregates(days_back)
             
-            if not history_data:
+            if not aggregates or not aggregates[0]:
                 return self._get_fallback_data()
             
-            # Process data locally
-            domain_stats = self.chrome_reader.get_domain_stats(history_data)
-            search_queries = self.chrome_reader.get_search_queries(history_data)
-            
-            # Calculate category stats
-            category_stats = {}
-            for entry in history_data:
-                category = entry['category']
-                category_stats[category] = category_stats.get(category, 0) + 1
+            domain_stats, category_stats, hourly_activity = aggregates
             
-            # Calculate hourly activity
-            hourly_activity = {}
-            for entry in history_data:
-                if entry['visit_time']:
-                    hour = str(entry['visit_time'].hour)
-                    hourly_activity[hour] = hourly_activity.get(hour, 0) + 1
+            search_queries = self.chrome_reader.get_search_queries_sql(days_back)
             
             return self._format_dashboard_data(
                 domain_stats, search_queries, category_stats, hourly_activity
@@ -317,13 +332,13 @@ class DataManager:
     def get_chrome_history_info(self):
         """Get information about Chrome history availability"""
         try:
-            # Try to get a small sample of history
-            sample_data = self.chrome_reader.get_chrome_history(days_back=1)
+            # Try to get a small sample of recent history
+            sample_data = self.chrome_reader.quick_info(limit=5)
             
             info = {
                 'accessible': len(sample_data) > 0,
                 'sample_count': len(sample_data),
-                'sample_domains': list(set([entry['domain'] for entry in sample_data[:5]])) if sample_data else [],
+                'sample_domains': list(set(entry['domain'] for entry in sample_data)),
                 'last_collection': self.last_collection_time.isoformat() if self.last_collection_time else None
             }
             
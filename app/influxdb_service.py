@@ -1,12 +1,176 @@
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
-from datetime import datetime, timedelta
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import WriteOptions, WriteType
+from datetime import datetime, timedelta, timezone
+import functools
+import inspect
 import logging
 import os
+import time
+from chrome_history import extract_search_query
 
 logger = logging.getLogger(__name__)
 
+# Line-protocol escaping, as done by influxdb_client's Point
+_ESCAPE_TAG = str.maketrans({
+    ',': r'\,',
+    '=': r'\=',
+    ' ': r'\ ',
+    '\n': r'\n',
+    '\t': r'\t',
+    '\r': r'\r',
+})
+_ESCAPE_STRING = str.maketrans({
+    '"': r'\"',
+    '\\': r'\\',
+})
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _escape_tag(value):
+    value = value.translate(_ESCAPE_TAG)
+    # A trailing backslash would escape the separator that follows it
+    return value + ' ' if value.endswith('\\') else value
+
+def _to_us(dt):
+    """Microseconds since the epoch, Chrome's own visit-time precision; naive
+    datetimes are taken as UTC, like Point.time()"""
+    if dt.tzinfo:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICROSECOND
+
+def _to_line(entry):
+    """Format a HistoryEntry as a chrome_history line-protocol record"""
+    # url is a field, not a tag: as a tag every distinct URL became its own series.
+    # Points on one domain are then told apart only by their microsecond timestamp.
+    tags = ''.join(
+        f',{key}={_escape_tag(value)}'
+        for key, value in (('category', entry.category), ('domain', entry.domain))
+        if value
+    )
+    title = entry.title
+    title_field = f'title="{title.translate(_ESCAPE_STRING)}",' if title is not None else ''
+    return (
+        f"chrome_history{tags} {title_field}"
+        f"typed_count={entry.typed_count}i,"
+        f"url=\"{entry.url.translate(_ESCAPE_STRING)}\","
+        f"visit_count={entry.visit_count}i "
+        f"{_to_us(entry.visit_time)}"
+    )
+
+# Cached query results kept per service; keys come from request arguments
+_QUERY_CACHE_SIZE = 64
+_QUERY_CACHE_TTL = 30
+
+def _cached_query(label, fallback):
+    """Run a query method with the connection check and error handling shared
+    by the getters, memoising successful results for _QUERY_CACHE_TTL seconds
+
+    Results are cached in the instance's _cache per (method, arguments); the
+    fallback() value returned when disconnected or on error is never cached.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.client:
+                logger.error("Not connected to InfluxDB")
+                return fallback()
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (method.__name__, *list(bound.arguments.values())[1:])
+            hit = self._cache.get(key)
+            now = time.monotonic()
+            if hit and now - hit[0] < _QUERY_CACHE_TTL:
+                return hit[1]
+
+            try:
+                value = method(self, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error querying InfluxDB ({label}): {e}")
+                return fallback()
+
+            # Evict the oldest entry rather than growing with every distinct ?days=
+            if key not in self._cache and len(self._cache) >= _QUERY_CACHE_SIZE:
+                self._cache.pop(next(iter(self._cache), None), None)
+            self._cache[key] = (now, value)
+            return value
+        return wrapper
+    return decorator
+
 class InfluxDBService:
+    # Flux templates; {bucket} is filled in once in __init__ and {range} on each
+    # call. Flux query parameters would avoid the substitution, but only InfluxDB
+    # Cloud supports them. Each aggregate is a pipe shared by its single-purpose
+    # query and its branch of the dashboard bundle, so the two cannot drift.
+    _FLUX_HISTORY = '''
+    from(bucket: "{bucket}")
+      |> {range}
+      |> filter(fn: (r) => r._measurement == "chrome_history")'''
+    _FLUX_SEARCHES = '''
+    from(bucket: "{bucket}")
+      |> {range}
+      |> filter(fn: (r) => r._measurement == "chrome_search" and r._field == "count")'''
+
+    # keep() trims each result row to the columns the getter reads, so less
+    # annotated CSV is sent and parsed per record. sort() and limit() work per
+    # table and the sums leave one table per domain, so ungroup first.
+    _PIPE_DOMAINS = '''
+      |> filter(fn: (r) => r._field == "visit_count")
+      |> group(columns: ["domain"])
+      |> sum()
+      |> rename(columns: {_value: "visit_count"})
+      |> keep(columns: ["domain", "visit_count"])
+      |> group()
+      |> sort(columns: ["visit_count"], desc: true)
+      |> limit(n: 50)'''
+
+    # Queries are pre-extracted into chrome_search at ingest; ungroup
+    # before sorting so the top 50 is taken across all queries
+    _PIPE_SEARCHES = '''
+      |> group(columns: ["query"])
+      |> sum()
+      |> keep(columns: ["query", "_value"])
+      |> group()
+      |> sort(columns: ["_value"], desc: true)
+      |> limit(n: 50)'''
+
+    # Option A: count points by category
+    _PIPE_CATEGORIES = '''
+      |> filter(fn: (r) => r._field == "visit_count")
+      |> group(columns: ["category"])
+      |> count()
+      |> rename(columns: {_value: "count"})
+      |> keep(columns: ["category", "count"])'''
+
+    # Counts are bucketed per hour by the storage engine, then summed per
+    # hour of day; _time is the window start (timeSrc), since
+    # aggregateWindow resets _start to the query range. Needs import "date".
+    _PIPE_HOURLY = '''
+      |> filter(fn: (r) => r._field == "visit_count")
+      |> aggregateWindow(every: 1h, fn: count, createEmpty: false, timeSrc: "_start")
+      |> map(fn: (r) => ({_value: r._value, hour: string(v: date.hour(t: r._time))}))
+      |> group(columns: ["hour"])
+      |> sum()
+      |> rename(columns: {_value: "count"})
+      |> keep(columns: ["hour", "count"])'''
+
+    _Q_DOMAINS = _FLUX_HISTORY + _PIPE_DOMAINS
+    _Q_SEARCHES = _FLUX_SEARCHES + _PIPE_SEARCHES
+    _Q_CATEGORIES = _FLUX_HISTORY + _PIPE_CATEGORIES
+    _Q_HOURLY = 'import "date"' + _FLUX_HISTORY + _PIPE_HOURLY
+
+    # One request feeding four named yields over a single chrome_history scan
+    _Q_DASHBOARD = (
+        'import "date"\ndata =' + _FLUX_HISTORY + '\n'
+        + '\ndata' + _PIPE_DOMAINS + '\n  |> yield(name: "domains")\n'
+        + '\ndata' + _PIPE_CATEGORIES + '\n  |> yield(name: "categories")\n'
+        + '\ndata' + _PIPE_HOURLY + '\n  |> yield(name: "hours")\n'
+        + _FLUX_SEARCHES + _PIPE_SEARCHES + '\n  |> yield(name: "searches")\n'
+    )
+
     def __init__(self):
         # InfluxDB configuration - can be overridden by environment variables
         self.url = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
@@ -17,289 +181,253 @@ class InfluxDBService:
         self.client = None
         self.write_api = None
         self.query_api = None
+        # Query results by (method, args); data only moves on the collector interval
+        self._cache = {}
+        
+        self._q_domains = self._Q_DOMAINS.replace('{bucket}', self.bucket)
+        self._q_searches = self._Q_SEARCHES.replace('{bucket}', self.bucket)
+        self._q_categories = self._Q_CATEGORIES.replace('{bucket}', self.bucket)
+        self._q_hourly = self._Q_HOURLY.replace('{bucket}', self.bucket)
+        self._q_dashboard = self._Q_DASHBOARD.replace('{bucket}', self.bucket)
         
     def connect(self):
         """Connect to InfluxDB"""
+        # Published on self only once working, so no request thread ever sees a
+        # client that failed its ping or has no write API yet
+        client = write_api = None
         try:
-            self.client = InfluxDBClient(
+            client = InfluxDBClient(
                 url=self.url,
                 token=self.token,
-                org=self.org
+                org=self.org,
+                enable_gzip=True,  # line protocol full of URLs compresses well
+                # Shared by the Flask request threads, the collector and the write
+                # API's flush thread. The default of cpu_count() * 5 leaves a 1-2
+                # core container with 5-10 connections; a fixed 32 covers
+                # concurrent dashboard polling regardless of core count.
+                connection_pool_maxsize=32
             )
             
-            # Test connection
-            self.client.ping()
-            
-            self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
-            self.query_api = self.client.query_api()
+            # ping() is the connectivity check; it returns False rather than raising
+            if not client.ping():
+                raise ConnectionError("ping failed")
+            
+            # Batching writes are buffered and flushed from a background thread,
+            # so callers never block on the HTTP request
+            write_api = client.write_api(
+                write_options=WriteOptions(
+                    write_type=WriteType.batching,
+                    batch_size=1000,
+                    flush_interval=3000,
+                    jitter_interval=1000,
+                    retry_interval=5000,
+                    max_close_wait=30000  # don't hold shutdown on retries for minutes
+                ),
+                success_callback=self._on_write_success,
+                error_callback=self._on_write_error
+            )
+            query_api = client.query_api()
             
+            self.client, self.write_api, self.query_api = client, write_api, query_api
             logger.info("Successfully connected to InfluxDB")
             logger.info(f"InfluxDB URL: {self.url}")
             logger.info(f"InfluxDB Org: {self.org}")
             logger.info(f"InfluxDB Bucket: {self.bucket}")
             
-            # Ensure bucket exists
+            # Ensure bucket exists; this creates it on a fresh server and costs
+            # a single lookup otherwise
             if not self.ensure_bucket_exists():
                 logger.warning("Could not ensure bucket exists, some operations may fail")
             
-            # Test a simple query
-            if not self.test_query():
-                logger.warning("InfluxDB test query failed, connection may have issues")
-            
-            # Test basic functionality
-            if not self.test_basic_functionality():
-                logger.warning("InfluxDB basic functionality test failed")
-            
-            # Get server information
-            info = self.get_info()
-            if info:
-                logger.info(f"InfluxDB server info: {info}")
+            # The self-tests cost several extra round trips, so they only run on request
+            if os.getenv('INFLUXDB_SELFTEST') == '1':
+                # Test a simple query
+                if not self.test_query():
+                    logger.warning("InfluxDB test query failed, connection may have issues")
+                
+                # Test basic functionality
+                if not self.test_basic_functionality():
+                    logger.warning("InfluxDB basic functionality test failed")
+                
+                # Get server information
+                info = self.get_info()
+                if info:
+                    logger.info(f"InfluxDB server info: {info}")
             
             return True
             
         except Exception as e:
+            if write_api:
+                write_api.close()
+            if client:
+                client.close()
             logger.error(f"Failed to connect to InfluxDB: {e}")
             logger.error(f"InfluxDB URL: {self.url}")
             logger.error(f"InfluxDB Org: {self.org}")
             logger.error(f"InfluxDB Bucket: {self.bucket}")
             return False
     
+    def _range_clause(self, days_back):
+        """Flux range relative to now(), so no timestamps are formatted per query"""
+        return f'range(start: -{int(days_back)}d)'
+    
     def close(self):
-        """Close InfluxDB connection"""
+        """Flush pending writes and close InfluxDB connection"""
+        if self.write_api:
+            self.write_api.close()
         if self.client:
             self.client.close()
     
+    def _on_write_success(self, conf, data):
+        """Drop cached query results once a batch has actually reached InfluxDB"""
+        self._cache.clear()
+    
+    def _on_write_error(self, conf, data, exception):
+        """Log a batch the write API gave up on"""
+        bucket, org, precision = conf
+        logger.error(f"Failed to write batch to InfluxDB bucket '{bucket}': {exception}")
+    
     def store_chrome_history(self, history_data):
-        """Store Chrome history data in InfluxDB"""
+        """Store Chrome history data in InfluxDB
+        
+        Returns the number of history entries queued, which is 0 when none
+        needed writing, or None if the data could not be queued.
+        """
         if not self.client:
             logger.error("Not connected to InfluxDB")
-            return False
+            return None
         
         try:
-            points = []
-            
+            # Plain line-protocol strings skip building a Point per entry
+            lines = []
+            entries = 0
             for entry in history_data:
-                if entry['visit_time']:
-                    point = Point("chrome_history") \
-                        .tag("domain", entry['domain']) \
-                        .tag("category", entry['category']) \
-                        .tag("url", entry['url']) \
-                        .field("title", entry['title']) \
-                        .field("visit_count", entry['visit_count']) \
-                        .field("typed_count", entry['typed_count']) \
-                        .time(entry['visit_time'])
-                    
-                    points.append(point)
-            
-            if points:
-                self.write_api.write(bucket=self.bucket, record=points)
-                logger.info(f"Stored {len(points)} history entries in InfluxDB")
-                return True
+                # Entries with no time, or never visited nor typed, carry nothing to chart
+                if not entry.visit_time or not (entry.visit_count or entry.typed_count):
+                    continue
+                lines.append(_to_line(entry))
+                entries += 1
+                # Search terms are extracted once here so queries can sum them in Flux
+                query = self._extract_search_query(entry.url)
+                if query:
+                    lines.append(
+                        f"chrome_search,query={_escape_tag(query)} count=1i {_to_us(entry.visit_time)}"
+                    )
+            
+            if not lines:
+                logger.info("No history entries to store in InfluxDB")
+                return 0
+            
+            # Queued on the batching write API, which splits the list into batches
+            self.write_api.write(bucket=self.bucket, record=lines, write_precision=WritePrecision.US)
+            logger.info(f"Queued {entries} history entries and {len(lines) - entries} search queries for InfluxDB")
+            return entries
                 
         except Exception as e:
             logger.error(f"Error storing data in InfluxDB: {e}")
-            return False
-        
-        return False
+            return None
     
+    @_cached_query('domains', fallback=list)
     def get_domain_stats(self, days_back=7):
         """Get domain statistics from InfluxDB"""
-        if not self.client:
-            logger.error("Not connected to InfluxDB")
-            return []
-        
-        try:
-            # Calculate time range
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=days_back)
-            
-            # Format datetime as RFC3339 string for InfluxDB (UTC)
-            start_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            end_str = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            
-            logger.debug(f"Time range: {start_str} to {end_str}")
-            
-            query = f'''
-            from(bucket: "{self.bucket}")
-              |> range(start: {start_str}, stop: {end_str})
-              |> filter(fn: (r) => r._measurement == "chrome_history" and r._field == "visit_count")
-              |> group(columns: ["domain"])
-              |> sum()
-              |> rename(columns: {{_value: "visit_count"}})
-              |> sort(columns: ["visit_count"], desc: true)
-              |> limit(n: 50)
-            '''
-            
-            logger.debug(f"Executing InfluxDB query: {query}")
-            result = self.query_api.query(query)
-            
-            domain_stats = []
-            for table in result:
-                for record in table.records:
-                    domain_stats.append({
-                        'domain': record.values.get("domain", "unknown"),
-                        'visit_count': int(record.values.get("visit_count", 0)),
-                        'category': record.values.get("category", "unknown")
-                    })
-            
-            return domain_stats
-            
-        except Exception as e:
-            logger.error(f"Error querying InfluxDB (domains): {e}")
-            return []
-    
+        query = self._q_domains.replace('{range}', self._range_clause(days_back))
+
+        logger.debug(f"Executing InfluxDB query: {query}")
+
+        domain_stats = []
+        for record in self.query_api.query_stream(query):
+            domain_stats.append({
+                'domain': record.values.get("domain", "unknown"),
+                'visit_count': int(record.values.get("visit_count", 0)),
+                'category': record.values.get("category", "unknown")
+            })
+
+        return domain_stats
+
+    @_cached_query('searches', fallback=list)
     def get_search_queries(self, days_back=7):
         """Get search query statistics from InfluxDB"""
-        if not self.client:
-            logger.error("Not connected to InfluxDB")
-            return []
-        
-        try:
-            # Calculate time range
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=days_back)
-            
-            # Format datetime as RFC3339 string for InfluxDB (UTC)
-            start_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            end_str = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            
-            # Pull urls and times; we don't aggregate in Flux here
-            query = f'''
-            from(bucket: "{self.bucket}")
-              |> range(start: {start_str}, stop: {end_str})
-              |> filter(fn: (r) => r._measurement == "chrome_history")
-              |> keep(columns: ["_time","url"])
-            '''
-            
-            logger.debug(f"Executing InfluxDB query: {query}")
-            result = self.query_api.query(query)
-            
-            counts = {}
-            for table in result:
-                for record in table.records:
-                    url = record.values.get("url")
-                    if not url:
-                        continue
-                    q = self._extract_search_query(url)
-                    if q:
-                        counts[q] = counts.get(q, 0) + 1
-            
-            top = [{"query": k, "count": v} for k, v in counts.items()]
-            top.sort(key=lambda x: x["count"], reverse=True)
-            return top[:50]
-            
-        except Exception as e:
-            logger.error(f"Error querying InfluxDB (searches): {e}")
-            return []
-    
+        query = self._q_searches.replace('{range}', self._range_clause(days_back))
+
+        logger.debug(f"Executing InfluxDB query: {query}")
+
+        top = []
+        for record in self.query_api.query_stream(query):
+            top.append({
+                "query": record.values.get("query"),
+                "count": int(record.values.get("_value", 0))
+            })
+
+        return top
+
+    @_cached_query('categories', fallback=dict)
     def get_category_stats(self, days_back=7):
         """Get category statistics from InfluxDB"""
-        if not self.client:
-            logger.error("Not connected to InfluxDB")
-            return {}
-        
-        try:
-            # Calculate time range
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=days_back)
-            
-            # Format datetime as RFC3339 string for InfluxDB (UTC)
-            start_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            end_str = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            
-            # Option A: count points by category
-            query = f'''
-            from(bucket: "{self.bucket}")
-              |> range(start: {start_str}, stop: {end_str})
-              |> filter(fn: (r) => r._measurement == "chrome_history")
-              |> group(columns: ["category"])
-              |> count()
-              |> rename(columns: {{_value: "count"}})
-            '''
-            
-            logger.debug(f"Executing InfluxDB query: {query}")
-            result = self.query_api.query(query)
-            
-            category_stats = {}
-            for table in result:
-                for record in table.records:
-                    cat = record.values.get("category", "other")
-                    category_stats[cat] = int(record.values.get("count", 0))
-            
-            return category_stats
-            
-        except Exception as e:
-            logger.error(f"Error querying InfluxDB (categories): {e}")
-            return {}
-    
+        query = self._q_categories.replace('{range}', self._range_clause(days_back))
+
+        logger.debug(f"Executing InfluxDB query: {query}")
+
+        category_stats = {}
+        for record in self.query_api.query_stream(query):
+            cat = record.values.get("category", "other")
+            category_stats[cat] = int(record.values.get("count", 0))
+
+        return category_stats
+
+    @_cached_query('hourly', fallback=dict)
     def get_hourly_activity(self, days_back=7):
         """Get hourly activity patterns from InfluxDB"""
-        if not self.client:
-            logger.error("Not connected to InfluxDB")
-            return {}
-        
-        try:
-            # Calculate time range
-            end_time = datetime.utcnow()
-            start_time = end_time - timedelta(days=days_back)
-            
-            # Format datetime as RFC3339 string for InfluxDB (UTC)
-            start_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            end_str = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            
-            query = f'''
-            import "date"
-            from(bucket: "{self.bucket}")
-              |> range(start: {start_str}, stop: {end_str})
-              |> filter(fn: (r) => r._measurement == "chrome_history")
-              |> map(fn: (r) => ({{
-                  r with hour: string(v: date.hour(t: r._time))
-              }}))
-              |> keep(columns: ["hour","_time"])
-              |> group(columns: ["hour"])
-              |> count(column: "_time")
-              |> rename(columns: {{_value: "count"}})
-            '''
-            
-            logger.debug(f"Executing InfluxDB query: {query}")
-            result = self.query_api.query(query)
-            
-            hourly_stats = {}
-            for table in result:
-                for record in table.records:
-                    hour = record.values.get("hour", "0")
-                    hourly_stats[str(hour)] = int(record.values.get("count", 0))
-            
-            return hourly_stats
-            
-        except Exception as e:
-            logger.error(f"Error querying InfluxDB (hourly): {e}")
-            return {}
-    
+        query = self._q_hourly.replace('{range}', self._range_clause(days_back))
+
+        logger.debug(f"Executing InfluxDB query: {query}")
+
+        hourly_stats = {}
+        for record in self.query_api.query_stream(query):
+            hour = record.values.get("hour", "0")
+            hourly_stats[str(hour)] = int(record.values.get("count", 0))
+
+        return hourly_stats
+
+    @_cached_query('dashboard', fallback=lambda: ([], [], {}, {}))
+    def get_dashboard_bundle(self, days_back=7):
+        """Get domain, search, category and hourly stats in one round trip.
+
+        Returns (domain_stats, search_queries, category_stats, hourly_activity).
+        """
+        query = self._q_dashboard.replace('{range}', self._range_clause(days_back))
+
+        logger.debug(f"Executing InfluxDB query: {query}")
+
+        domain_stats = []
+        category_stats = {}
+        hourly_stats = {}
+        search_queries = []
+        for record in self.query_api.query_stream(query):
+            values = record.values
+            name = values.get("result")
+            if name == "domains":
+                domain_stats.append({
+                    'domain': values.get("domain", "unknown"),
+                    'visit_count': int(values.get("visit_count", 0)),
+                    'category': values.get("category", "unknown")
+                })
+            elif name == "categories":
+                cat = values.get("category", "other")
+                category_stats[cat] = int(values.get("count", 0))
+            elif name == "hours":
+                hour = values.get("hour", "0")
+                hourly_stats[str(hour)] = int(values.get("count", 0))
+            elif name == "searches":
+                search_queries.append({
+                    "query": values.get("query"),
+                    "count": int(values.get("_value", 0))
+                })
+
+        return domain_stats, search_queries, category_stats, hourly_stats
+
     def _extract_search_query(self, url):
-        """Extract search query from URL"""
-        try:
-            if 'google.com/search' in url:
-                query_start = url.find('q=') + 2
-                query_end = url.find('&', query_start)
-                if query_end == -1:
-                    query_end = len(url)
-                query = url[query_start:query_end]
-            elif 'bing.com/search' in url:
-                query_start = url.find('q=') + 2
-                query_end = url.find('&', query_start)
-                if query_end == -1:
-                    query_end = len(url)
-                query = url[query_start:query_end]
-            else:
-                return None
-            
-            # Decode URL encoding
-            query = query.replace('+', ' ').replace('%20', ' ')
-            return query if query and len(query) > 2 else None
-            
-        except Exception:
-            return None
+        """Extract search query from URL, the same way the local path does"""
+        return extract_search_query(url)
     
     def cleanup_old_data(self, days_to_keep=30):
         """Clean up old data from InfluxDB"""
@@ -308,26 +436,19 @@ class InfluxDBService:
             return False
         
         try:
-            cutoff_time = datetime.now() - timedelta(days=days_to_keep)
-            
-            # Format datetime as RFC3339 string for InfluxDB (UTC)
-            cutoff_str = cutoff_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-            
             query = f'''
             from(bucket: "{self.bucket}")
-                |> range(start: 0, stop: {cutoff_str})
+                |> range(start: 0, stop: -{int(days_to_keep)}d)
                 |> filter(fn: (r) => r._measurement == "chrome_history")
                 |> count()
             '''
             
             logger.debug(f"Executing InfluxDB cleanup query: {query}")
-            result = self.query_api.query(query)
             
             # Count records that would be deleted
             record_count = 0
-            for table in result:
-                for record in table.records:
-                    record_count += record.get_value()
+            for record in self.query_api.query_stream(query):
+                record_count += record.get_value()
             
             logger.info(f"Found {record_count} records older than {days_to_keep} days")
             return True
@@ -351,13 +472,11 @@ class InfluxDBService:
             '''
             
             logger.info(f"Testing InfluxDB query: {query}")
-            result = self.query_api.query(query)
             
             # Count results
             record_count = 0
-            for table in result:
-                for record in table.records:
-                    record_count += 1
+            for record in self.query_api.query_stream(query):
+                record_count += 1
             
             logger.info(f"InfluxDB test query successful, found {record_count} records")
             return True
@@ -376,20 +495,19 @@ class InfluxDBService:
             # Get buckets API
             buckets_api = self.client.buckets_api()
             
-            # Check if bucket exists
-            try:
-                bucket = buckets_api.find_bucket_by_name(self.bucket)
+            # find_bucket_by_name returns None when there is no such bucket
+            bucket = buckets_api.find_bucket_by_name(self.bucket)
+            if bucket is not None:
                 logger.info(f"Bucket '{self.bucket}' already exists")
                 return True
-            except Exception:
-                # Bucket doesn't exist, create it
-                logger.info(f"Creating bucket '{self.bucket}'...")
-                bucket = buckets_api.create_bucket(
-                    bucket_name=self.bucket,
-                    org=self.org
-                )
-                logger.info(f"Successfully created bucket '{self.bucket}'")
-                return True
+            
+            logger.info(f"Creating bucket '{self.bucket}'...")
+            bucket = buckets_api.create_bucket(
+                bucket_name=self.bucket,
+                org=self.org
+            )
+            logger.info(f"Successfully created bucket '{self.bucket}'")
+            return True
                 
         except Exception as e:
             logger.error(f"Error ensuring bucket exists: {e}")
@@ -460,8 +578,8 @@ class InfluxDBService:
             '''
             
             logger.info("Testing basic count query...")
-            result1 = self.query_api.query(query1)
-            logger.info(f"Count query successful, result: {result1}")
+            count1 = sum(1 for _ in self.query_api.query_stream(query1))
+            logger.info(f"Count query successful, {count1} records")
             
             # Test 2: Simple filter query
             query2 = f'''
@@ -472,8 +590,8 @@ class InfluxDBService:
             '''
             
             logger.info("Testing filter query...")
-            result2 = self.query_api.query(query2)
-            logger.info(f"Filter query successful, result: {result2}")
+            count2 = sum(1 for _ in self.query_api.query_stream(query2))
+            logger.info(f"Filter query successful, {count2} records")
             
             return True
             
@@ -1,6 +1,10 @@
-from flask import Flask, render_template, jsonify, send_from_directory, request
+from flask import Flask, render_template, jsonify, send_file, request, abort
+from flask.json.provider import JSONProvider
+from werkzeug.security import safe_join
 from flask_cors import CORS
+import orjson
 import os
+import threading
 from pathlib import Path
 import logging
 from data_manager import DataManager
@@ -10,49 +14,142 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(JSONProvider):
+    """Serialise JSON responses with orjson instead of the stdlib json module"""
+    
+    def dumps(self, obj, **kwargs):
+        # Hour-keyed dicts may use int keys, which orjson only accepts with this option
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for development
 
 # Initialize data manager
 data_manager = DataManager()
 
-def startup():
-    """Start data collection service on first request"""
-    try:
-        logger.info("Starting data collection service...")
-        data_manager.start_data_collection()
-        logger.info("Data collection service started successfully")
-    except Exception as e:
-        logger.error(f"Failed to start data collection service: {e}")
+_collector_lock = threading.Lock()
+_collector_started = False
+# Set once the first start attempt has finished, whether or not it succeeded
+_collector_ready = threading.Event()
 
-# Use a more compatible approach for Flask 2.3+
 def _start_collector_once():
-    """Start data collection service on first request"""
+    """Start data collection service once per process"""
+    global _collector_started
+    with _collector_lock:
+        if _collector_started:
+            return
+        _collector_started = True
+    
     try:
         logger.info("Starting data collection service...")
         data_manager.start_data_collection()
         logger.info("Data collection service started successfully")
     except Exception as e:
         logger.error(f"Failed to start data collection service: {e}")
+    finally:
+        _collector_ready.set()
+
+def _starting_response():
+    """503 returned while the collector is still starting up"""
+    return jsonify({"status": "starting", "message": "Data collection is starting, retry shortly"}), 503
 
-# Start the data collection when the app starts
-startup()
+def _boot_collector():
+    """Start data collection in the background so importing the app doesn't
+    wait on InfluxDB and the first Chrome history sync"""
+    threading.Thread(target=_start_collector_once, name='collector-boot', daemon=True).start()
+
+def _boot_collector_after_fork():
+    """Give a forked worker (e.g. gunicorn --preload) its own collector
+    
+    Only the forking thread survives a fork, so the parent's boot and scheduler
+    threads never run in the child and its ready event would never be set. The
+    child also must not share the parent's InfluxDB and SQLite connections.
+    """
+    global data_manager, _inherited_data_manager, _collector_lock, _collector_started, _collector_ready
+    # Kept referenced, never closed: closing would flush the parent's write
+    # batches from here and wait on a batching thread the fork did not copy
+    _inherited_data_manager = data_manager
+    data_manager = DataManager()
+    _collector_lock = threading.Lock()
+    _collector_started = False
+    _collector_ready = threading.Event()
+    _boot_collector()
+
+_boot_collector()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_boot_collector_after_fork)
 
 # Serve React frontend
+_DIST_DIR = Path(app.root_path) / 'frontend' / 'dist'
+# Built files by URL path, scanned at startup; files from a later rebuild are
+# added by _static_file on their first request, and ones it deleted are
+# dropped when sending them fails
+_STATIC_FILES = {
+    file.relative_to(_DIST_DIR).as_posix(): file
+    for file in (_DIST_DIR.rglob('*') if _DIST_DIR.is_dir() else ())
+    if file.is_file()
+}
+# Vite content-hashes everything under assets/, so those never change in place
+_ASSET_MAX_AGE = 31536000
+
+def _static_file(path):
+    """Built file for a URL path, or None for SPA routes
+    
+    A miss goes to disk only for index.html and assets/, so client-side routes
+    cost no stat, and it is not remembered, so the map holds only real files.
+    """
+    static_file = _STATIC_FILES.get(path)
+    if static_file is None and (path == 'index.html' or path.startswith('assets/')):
+        joined = safe_join(str(_DIST_DIR), path)
+        if joined is not None and Path(joined).is_file():
+            static_file = _STATIC_FILES[path] = Path(joined)
+    return static_file
+
+def _send_index():
+    """index.html must always be revalidated so new asset hashes get picked up"""
+    index_file = _static_file('index.html')
+    if index_file is None:
+        abort(404)
+    try:
+        response = send_file(index_file, conditional=True)
+    except FileNotFoundError:
+        _STATIC_FILES.pop('index.html', None)
+        abort(404)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route("/")
 def index():
-    return send_from_directory('frontend/dist', 'index.html')
+    return _send_index()
 
 @app.route("/<path:path>")
 def serve_static(path):
-    if os.path.exists(f"frontend/dist/{path}"):
-        return send_from_directory('frontend/dist', path)
-    return send_from_directory('frontend/dist', 'index.html')
+    static_file = _static_file(path)
+    if static_file is None or path == 'index.html':
+        return _send_index()
+    try:
+        if path.startswith('assets/'):
+            response = send_file(static_file, conditional=True, max_age=_ASSET_MAX_AGE)
+            response.headers['Cache-Control'] += ', immutable'
+            return response
+        return send_file(static_file, conditional=True)
+    except FileNotFoundError:
+        # Deleted by a rebuild since it was mapped, e.g. an old hashed chunk an
+        # open tab still asks for; forget it and answer like any SPA route
+        _STATIC_FILES.pop(path, None)
+        return _send_index()
 
 # API endpoints
 @app.route("/api/dashboard")
 def dashboard():
     """Return real dashboard data from Chrome history"""
+    if not _collector_ready.is_set():
+        return _starting_response()
+    
     try:
         # Get days parameter from query string, default to 7
         days_back = request.args.get('days', 7, type=int)
@@ -71,6 +168,9 @@ def dashboard():
 @app.route("/api/refresh")
 def refresh_data():
     """Force refresh of Chrome history data"""
+    if not _collector_ready.is_set():
+        return _starting_response()
+    
     try:
         success = data_manager.force_refresh()
         if success:
@@ -84,6 +184,9 @@ def refresh_data():
 @app.route("/api/status")
 def status():
     """Get data collection status"""
+    if not _collector_ready.is_set():
+        return _starting_response()
+    
     try:
         status_info = {
             "data_collection_running": data_manager.is_running,
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+
+class HistoryEntry:
+    """A visited URL read from Chrome history
+
+    Slotted so the thousands of entries per collection carry no per-instance dict.
+    """
+    __slots__ = ('url', 'title', 'domain', 'visit_time', 'visit_count', 'typed_count', 'category')
+
+    def __init__(self, url: str, title: Optional[str], domain: str, visit_time: Optional[datetime],
+                 visit_count: int, typed_count: int, category: str):
+        self.url = url
+        self.title = title
+        self.domain = domain
+        self.visit_time = visit_time
+        self.visit_count = visit_count
+        self.typed_count = typed_count
+        self.category = category
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'HistoryEntry({fields})'
@@ -5,16 +5,15 @@ This script demonstrates basic Chrome history access functionality
 """
 
 import sqlite3
-import shutil
 import os
 import sys
+from pathlib import Path
 
 def test_chrome_history():
     """Test basic Chrome history reading"""
     
     # مسیر فایل History
     history_path = os.path.expanduser("~/.config/google-chrome/Default/History")
-    temp_path = "/tmp/History_copy"
     
     print(f"Looking for Chrome history at: {history_path}")
     
@@ -27,14 +26,13 @@ def test_chrome_history():
     print("✅ Chrome history file found")
     
     try:
-        # کپی گرفتن از فایل (برای جلوگیری از قفل شدن)
-        print("📋 Copying history file to temporary location...")
-        shutil.copy2(history_path, temp_path)
-        print("✅ History file copied successfully")
-        
-        # اتصال به دیتابیس
-        print("🔌 Connecting to database...")
-        conn = sqlite3.connect(temp_path)
+        # اتصال فقط-خواندنی به دیتابیس، بدون کپی
+        # (immutable=1 قفل فایل Chrome را نادیده می‌گیرد)
+        print("🔌 Connecting to database (read-only)...")
+        uri = f"{Path(history_path).absolute().as_uri()}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True)
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA query_only=1")
         cursor = conn.cursor()
         print("✅ Database connection established")
         
@@ -64,11 +62,6 @@ def test_chrome_history():
         conn.close()
         print("✅ Database connection closed")
         
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            print("✅ Temporary file cleaned up")
-        
         return True
         
     except Exception as e:
@@ -82,7 +75,9 @@ def test_advanced_features():
     print("="*80)
     
     try:
-        from app.chrome_history import ChromeHistoryReader
+        # app modules import each other by bare name (e.g. models)
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+        from chrome_history import ChromeHistoryReader
         
         print("📚 Testing ChromeHistoryReader class...")
         reader = ChromeHistoryReader()
@@ -127,6 +122,56 @@ def test_advanced_features():
         print(f"❌ Error testing advanced features: {e}")
         return False
 
+def test_domain_extraction():
+    """Check that the SQL host extraction agrees with _DOMAIN_RE"""
+    print("\n" + "="*80)
+    print("TESTING DOMAIN EXTRACTION")
+    print("="*80)
+
+    try:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+        from chrome_history import _DOMAIN_RE, _DOMAIN_STATS_QUERY
+
+        urls = [
+            "https://www.GitHub.com/a/b",
+            "http://example.org:8080/x",
+            "https://news.ycombinator.com?p=2",
+            "https://docs.python.org#intro",
+            "chrome://settings",
+            "chrome-extension://abcdefgh/popup.html",
+            "blob:https://web.whatsapp.com/1234",
+            "view-source:https://example.com/",
+            "file:///home/user/notes.txt",
+            "about:blank",
+            "data:text/html,<p>hi</p>",
+            "http://www./",
+        ]
+
+        # Same columns as Chrome's urls table that the queries read
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE urls (url TEXT, title TEXT, visit_count INTEGER, "
+                     "typed_count INTEGER, last_visit_time INTEGER, hidden INTEGER)")
+        conn.executemany("INSERT INTO urls VALUES (?, '', 1, 0, 1, 0)", [(url,) for url in urls])
+        sql_domains = {row[0]: row[1] for row in conn.execute(_DOMAIN_STATS_QUERY, (0,))}
+        conn.close()
+
+        python_domains = {}
+        for url in urls:
+            m = _DOMAIN_RE.match(url)
+            domain = m.group(1).lower() if m else "unknown"
+            python_domains[domain] = python_domains.get(domain, 0) + 1
+
+        if sql_domains != python_domains:
+            print(f"❌ SQL domains {sql_domains} differ from _DOMAIN_RE {python_domains}")
+            return False
+
+        print(f"✅ SQL and _DOMAIN_RE agree on {len(urls)} URLs ({len(sql_domains)} domains)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error testing domain extraction: {e}")
+        return False
+
 if __name__ == "__main__":
     print("🚀 Chrome History Test Script")
     print("="*80)
@@ -137,13 +182,17 @@ if __name__ == "__main__":
     # Test advanced features
     advanced_success = test_advanced_features()
     
+    # Test domain extraction
+    domain_success = test_domain_extraction()
+    
     print("\n" + "="*80)
     print("TEST RESULTS SUMMARY")
     print("="*80)
     print(f"Basic functionality: {'✅ PASS' if basic_success else '❌ FAIL'}")
     print(f"Advanced features:  {'✅ PASS' if advanced_success else '❌ FAIL'}")
+    print(f"Domain extraction:  {'✅ PASS' if domain_success else '❌ FAIL'}")
     
-    if basic_success and advanced_success:
+    if basic_success and advanced_success and domain_success:
         print("\n🎉 All tests passed! Your Chrome history integration is working correctly.")
     else:
         print("\n⚠️  Some tests failed. Check the output above for details.")